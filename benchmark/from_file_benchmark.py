@@ -0,0 +1,72 @@
+'''
+multivalued_dict - This is a multi-valued dictionary package.
+Copyright (C) 2019-2020  sosei
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+'''
+Throughput of multivalued_dict.from_file in rows per second, against parsing each
+row in Python and calling update with one pair at a time.
+
+    PYTHONPATH=src python benchmark/from_file_benchmark.py [rows] [distinct_keys]
+'''
+
+import csv
+import json
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+from multivalued_dict_package import multivalued_dict
+
+def write_files(tmp_dir, rows, distinct_keys):
+    csv_path = os.path.join(tmp_dir, 'kv.csv')
+    jsonl_path = os.path.join(tmp_dir, 'kv.jsonl')
+    with open(csv_path, 'w', newline = '') as csv_file, open(jsonl_path, 'w') as jsonl_file:
+        for i in range(rows):
+            key = f'user/{i % distinct_keys}'
+            csv_file.write(f'{key},{i}\n')
+            jsonl_file.write(json.dumps({'k': key, 'v': i}) + '\n')
+    return csv_path, jsonl_path
+
+def per_row_update(csv_path):
+    mv_d = multivalued_dict()
+    with open(csv_path, newline = '') as file:
+        for row in csv.reader(file):
+            mv_d.update([(row[0], row[1])])
+    return mv_d
+
+def report(name, rows, func):
+    start = perf_counter()
+    func()
+    elapsed = perf_counter() - start
+    print(f'{name:<48} {rows / elapsed:>12,.0f} rows/s')
+
+def main(rows = 1_000_000, distinct_keys = 50_000):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path, jsonl_path = write_files(tmp_dir, rows, distinct_keys)
+        print(f'{rows:,} rows, {distinct_keys:,} distinct keys')
+        report('per-row csv.reader + update', rows, lambda: per_row_update(csv_path))
+        for read_ahead in (False, True):
+            report(f'from_file csv read_ahead={read_ahead}', rows,
+                   lambda: multivalued_dict.from_file(csv_path, read_ahead = read_ahead))
+            report(f'from_file jsonl read_ahead={read_ahead}', rows,
+                   lambda: multivalued_dict.from_file(jsonl_path, format = 'jsonl', key_col = 'k', value_col = 'v', read_ahead = read_ahead))
+            report(f'from_file csv value_type=q read_ahead={read_ahead}', rows,
+                   lambda: multivalued_dict.from_file(csv_path, read_ahead = read_ahead, value_type = 'q'))
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:3]))
@@ -0,0 +1,51 @@
+'''
+multivalued_dict - This is a multi-valued dictionary package.
+Copyright (C) 2019-2020  sosei
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+'''
+Cost of filling a multivalued_dict with and without the prefix index, and of
+prefix queries against a full key scan.
+
+    PYTHONPATH=src python benchmark/prefix_index_benchmark.py [keys] [queries]
+'''
+
+import sys
+from time import perf_counter
+
+from multivalued_dict_package import multivalued_dict
+
+def timed(func):
+    start = perf_counter()
+    func()
+    return perf_counter() - start
+
+def main(keys = 400_000, queries = 1_000):
+    pairs = [(f'tenant/{i % 100}/user/{i}', i) for i in range(keys)]
+    prefixes = [f'tenant/{i % 100}/user/{i}' for i in range(0, keys, max(1, keys // queries))][:queries]
+    print(f'{keys:,} keys, {len(prefixes):,} prefix queries')
+    for indexed in (False, True):
+        mv_d = multivalued_dict()
+        if indexed:
+            mv_d.enable_prefix_index()
+        fill = timed(lambda: mv_d.update(pairs))
+        first_query = timed(lambda: mv_d.keys_with_prefix('tenant/0/'))
+        query = timed(lambda: [mv_d.keys_with_prefix(prefix) for prefix in prefixes])
+        print(f'index={indexed!s:<6} update {fill:8.3f}s   first query {first_query:8.4f}s   '
+              f'{len(prefixes) / query:>12,.0f} queries/s')
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:3]))
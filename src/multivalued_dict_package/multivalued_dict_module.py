@@ -18,16 +18,266 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 from check_self_class_call_of_meta_package import check_self_class_call_of_meta
 from abc import ABCMeta
-from collections import UserDict
+from array import array
+from bisect import bisect_left
+from collections import UserDict, defaultdict
+from functools import partial
+from itertools import islice
+from operator import itemgetter
 
 __all__ = ['multivalued_dict', 'START_POS', 'END_POS']
 
 START_POS = 'S'
 END_POS = 'E'
 
+_NUMERIC_TYPECODES = 'bBhHiIlLqQfd'
+
 class _eliminate_metaclass_conflicts(check_self_class_call_of_meta, ABCMeta):
     pass
 
+class _prefix_indexed_defaultdict(defaultdict):
+    '''
+        defaultdict that keeps its str keys in a sorted array, so that the keys
+        sharing a prefix can be found with bisect instead of a full key scan.
+        
+        Added keys are collected in pending_keys and removed ones in stale_keys,
+        so adding or removing a key is O(1); both are merged into sorted_keys by
+        the next prefix lookup, with one sort of the pending keys and one linear
+        merge, instead of an O(n) list insert or delete per key.
+    '''
+    
+    def __init__(self, default_factory = None, *args, **kwargs):
+        super().__init__(default_factory, *args, **kwargs)
+        self.sorted_keys = sorted(_key for _key in self if isinstance(_key, str))
+        self.pending_keys = set()
+        self.stale_keys = set()
+    
+    def __index_add(self, key):
+        if isinstance(key, str):
+            if key in self.stale_keys:
+                self.stale_keys.discard(key)
+            else:
+                self.pending_keys.add(key)
+    
+    def __index_remove(self, key):
+        if isinstance(key, str):
+            if key in self.pending_keys:
+                self.pending_keys.discard(key)
+            else:
+                sorted_keys = self.sorted_keys
+                i = bisect_left(sorted_keys, key)
+                if i < len(sorted_keys) and sorted_keys[i] == key:
+                    self.stale_keys.add(key)
+    
+    def __index_flush(self):
+        stale_keys = self.stale_keys
+        if self.pending_keys or len(stale_keys) * 2 > len(self.sorted_keys):
+            if stale_keys:
+                self.sorted_keys = [_key for _key in self.sorted_keys if _key not in stale_keys]
+                stale_keys.clear()
+            self.sorted_keys.extend(sorted(self.pending_keys))
+            self.sorted_keys.sort()
+            self.pending_keys.clear()
+    
+    def __setitem__(self, key, value):
+        if key not in self:
+            self.__index_add(key)
+        super().__setitem__(key, value)
+    
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.__index_remove(key)
+    
+    def setdefault(self, key, default = None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+    
+    def pop(self, key, *args):
+        if key in self:
+            self.__index_remove(key)
+        return super().pop(key, *args)
+    
+    def popitem(self):
+        _key, _value = super().popitem()
+        self.__index_remove(_key)
+        return (_key, _value)
+    
+    def update(self, *args, **kwargs):
+        for _key, _value in dict(*args, **kwargs).items():
+            self[_key] = _value
+    
+    def __ior__(self, other):
+        self.update(other)
+        return self
+    
+    def __or__(self, other):
+        if not isinstance(other, dict):
+            return NotImplemented
+        new_dict = self.copy()
+        new_dict.update(other)
+        return new_dict
+    
+    def __ror__(self, other):
+        if not isinstance(other, dict):
+            return NotImplemented
+        new_dict = type(self)(self.default_factory, other)
+        new_dict.update(self)
+        return new_dict
+    
+    def clear(self):
+        super().clear()
+        self.sorted_keys.clear()
+        self.pending_keys.clear()
+        self.stale_keys.clear()
+    
+    def keys_with_prefix(self, prefix):
+        self.__index_flush()
+        sorted_keys = self.sorted_keys
+        stale_keys = self.stale_keys
+        i = bisect_left(sorted_keys, prefix)
+        len_of_sorted_keys = len(sorted_keys)
+        while i < len_of_sorted_keys and sorted_keys[i].startswith(prefix):
+            if sorted_keys[i] not in stale_keys:
+                yield sorted_keys[i]
+            i += 1
+
+def _iter_file_batches(path, format, key_col, value_col, chunk_size, encoding, header, value_converter = None, value_type = None):
+    '''
+        Yield lists of (key, value) pairs, at most chunk_size pairs each, parsed from the
+        file at path.  The file is read through a large buffer and each batch is parsed
+        and split into columns with C-level iterators.  Errors in a row are raised as
+        ValueError naming the path and physical line of the row.
+    '''
+    
+    import csv
+    import json
+    
+    def jsonl_batches(file):
+        lines = enumerate(file, 1)
+        while True:
+            chunk = list(islice(lines, chunk_size))
+            if not chunk:
+                return
+            records = []
+            line_numbers = []
+            for line_number, _line in chunk:
+                if not _line.isspace():
+                    try:
+                        records.append(json.loads(_line))
+                    except ValueError as error:
+                        raise ValueError(f'{path} line {line_number}: {error}') from None
+                    line_numbers.append(line_number)
+            yield records, line_numbers.__getitem__
+    
+    def csv_batches(rows):
+        while True:
+            start_line = rows.line_num
+            batch = list(islice(rows, chunk_size))
+            if not batch:
+                return
+            def line_of(i, batch = batch, start_line = start_line):
+                return start_line + 1 + i + sum(''.join(row).count('\n') for row in batch[:i])
+            if [] in batch:
+                positions = [i for i, row in enumerate(batch) if row]
+                yield [batch[i] for i in positions], lambda i, line_of = line_of, positions = positions: line_of(positions[i])
+            else:
+                yield batch, line_of
+    
+    with open(path, 'r', encoding = encoding, newline = '', buffering = 1 << 20) as file:
+        if format == 'jsonl':
+            batches = jsonl_batches(file)
+        else:
+            rows = csv.reader(file, delimiter = '\t' if format == 'tsv' else ',')
+            if header:
+                column_names = next(rows, [])
+                try:
+                    if isinstance(key_col, str):
+                        key_col = column_names.index(key_col)
+                    if isinstance(value_col, str):
+                        value_col = column_names.index(value_col)
+                except ValueError:
+                    raise ValueError(f'{path} line 1: header has no column {key_col!r} or {value_col!r}: {column_names!r}') from None
+            batches = csv_batches(rows)
+        get_pair = itemgetter(key_col, value_col)
+        for batch, line_of in batches:
+            try:
+                pairs = list(map(get_pair, batch))
+            except (IndexError, KeyError, TypeError):
+                for i, row in enumerate(batch):
+                    try:
+                        get_pair(row)
+                    except (IndexError, KeyError, TypeError):
+                        raise ValueError(f'{path} line {line_of(i)} has no column {key_col!r} or {value_col!r}: {row!r}') from None
+            if value_converter is not None:
+                try:
+                    pairs = [(_key, value_converter(_value)) for _key, _value in pairs]
+                except (ValueError, TypeError):
+                    for i, (_key, _value) in enumerate(pairs):
+                        try:
+                            value_converter(_value)
+                        except (ValueError, TypeError) as error:
+                            raise ValueError(f'{path} line {line_of(i)}: {error}') from None
+            if value_type is not None:
+                try:
+                    array(value_type, map(itemgetter(1), pairs))
+                except (TypeError, OverflowError):
+                    for i, (_key, _value) in enumerate(pairs):
+                        try:
+                            array(value_type, (_value,))
+                        except (TypeError, OverflowError) as error:
+                            raise ValueError(f'{path} line {line_of(i)}: {error}') from None
+            yield pairs
+
+def _read_ahead(iterable, depth = 2):
+    '''
+        Iterate over iterable in a background thread, keeping at most depth items buffered.
+        The thread is stopped and joined when the iteration ends, early or not.
+    '''
+    
+    from queue import Queue, Full
+    from threading import Thread, Event
+    
+    buffer = Queue(maxsize = depth)
+    stopped = Event()
+    end_of_items = object()
+    
+    def put(item, error = None):
+        while not stopped.is_set():
+            try:
+                buffer.put((item, error), timeout = 0.1)
+                return True
+            except Full:
+                pass
+        return False
+    
+    def producer():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(end_of_items)
+        except BaseException as error:
+            put(end_of_items, error)
+        finally:
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                close()
+    
+    thread = Thread(target = producer, daemon = True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is end_of_items:
+                if error is not None:
+                    raise error
+                break
+            yield item
+    finally:
+        stopped.set()
+        thread.join()
+
 class multivalued_dict(UserDict, metaclass = _eliminate_metaclass_conflicts):  #lgtm [py/missing-call-to-init]
     '''
         multivalued_dict() -> new empty dictionary
@@ -80,7 +330,6 @@ class multivalued_dict(UserDict, metaclass = _eliminate_metaclass_conflicts):  #
         TypeError: multivalued_dict expected at most 1 arguments, got 2
     '''
     
-    from collections import defaultdict
     from collections.abc import Iterable
     
     version = '2.0.1'
@@ -95,7 +344,7 @@ class multivalued_dict(UserDict, metaclass = _eliminate_metaclass_conflicts):  #
             True
         '''
         
-        return (isinstance(x, cls) or ((True if x.default_factory == type([]) else False) if isinstance(x, cls.defaultdict) else False))
+        return (isinstance(x, cls) or ((True if x.default_factory == type([]) else False) if isinstance(x, defaultdict) else False))
     
     @classmethod
     def fromkeys(cls, iterable, value = None):
@@ -111,6 +360,139 @@ class multivalued_dict(UserDict, metaclass = _eliminate_metaclass_conflicts):  #
         dict_var = dict.fromkeys(iterable, value)
         return cls(dict_var)
     
+    @classmethod
+    def from_file(cls, path, format = 'csv', key_col = 0, value_col = 1, chunk_size = 65536, encoding = 'utf-8', header = False, read_ahead = False, value_type = None):
+        '''
+            Create a new dictionary from the key/value columns of a CSV, TSV or JSON Lines file.
+            
+            The file is streamed in batches of chunk_size rows, so memory use beyond the
+            dictionary itself stays bounded.  For 'csv' and 'tsv', key_col and value_col are
+            column indexes, or column names when header is True.  For 'jsonl', each line is a
+            JSON array or object and key_col and value_col are indexes or field names.  Blank
+            lines are skipped in every format.  With read_ahead, the file is read and parsed in
+            a background thread.  With value_type, the values are stored in typed arrays (see
+            set_value_type); CSV and TSV fields are converted with int or float first.
+            
+            >>> import os, tempfile
+            >>> with tempfile.TemporaryDirectory() as tmp_dir:
+            ...     path = os.path.join(tmp_dir, 'kv.csv')
+            ...     with open(path, 'w') as file:
+            ...         _ = file.write('id,name,score\\na,x,1\\nb,y,2\\na,z,3\\n')
+            ...     multivalued_dict.from_file(path, key_col = 'id', value_col = 'score', header = True, chunk_size = 2)
+            multivalued_dict({'a': ['1', '3'], 'b': ['2']})
+            
+            >>> with tempfile.TemporaryDirectory() as tmp_dir:
+            ...     path = os.path.join(tmp_dir, 'kv.jsonl')
+            ...     with open(path, 'w') as file:
+            ...         _ = file.write('{"k": "a", "v": 1}\\n{"k": "b", "v": 2}\\n\\n{"k": "a", "v": 3}\\n')
+            ...     multivalued_dict.from_file(path, format = 'jsonl', key_col = 'k', value_col = 'v', read_ahead = True)
+            multivalued_dict({'a': [1, 3], 'b': [2]})
+            
+            >>> with tempfile.TemporaryDirectory() as tmp_dir:
+            ...     path = os.path.join(tmp_dir, 'kv.tsv')
+            ...     with open(path, 'w') as file:
+            ...         _ = file.write('a\\t1\\nb\\n')
+            ...     multivalued_dict.from_file(path, format = 'tsv')  # doctest: +ELLIPSIS
+            Traceback (most recent call last):
+            ValueError: ... line 2 has no column 0 or 1: ['b']
+            
+            >>> with tempfile.TemporaryDirectory() as tmp_dir:
+            ...     path = os.path.join(tmp_dir, 'kv.csv')
+            ...     with open(path, 'w') as file:
+            ...         _ = file.write('a,1\\n\\nb,2\\n\\n')
+            ...     multivalued_dict.from_file(path)
+            multivalued_dict({'a': ['1'], 'b': ['2']})
+            
+            >>> with tempfile.TemporaryDirectory() as tmp_dir:
+            ...     path = os.path.join(tmp_dir, 'kv.csv')
+            ...     with open(path, 'w') as file:
+            ...         _ = file.write('a,1\\n\\n\\nb\\n\\n')
+            ...     multivalued_dict.from_file(path, chunk_size = 2)  # doctest: +ELLIPSIS
+            Traceback (most recent call last):
+            ValueError: ... line 4 has no column 0 or 1: ['b']
+            
+            >>> with tempfile.TemporaryDirectory() as tmp_dir:
+            ...     path = os.path.join(tmp_dir, 'kv.jsonl')
+            ...     with open(path, 'w') as file:
+            ...         _ = file.write('["a", 1]\\n\\n\\n["b" 2]\\n')
+            ...     multivalued_dict.from_file(path, format = 'jsonl')  # doctest: +ELLIPSIS
+            Traceback (most recent call last):
+            ValueError: ... line 4: Expecting ',' delimiter: line 1 column 6 (char 5)
+            
+            >>> with tempfile.TemporaryDirectory() as tmp_dir:
+            ...     path = os.path.join(tmp_dir, 'kv.csv')
+            ...     with open(path, 'w') as file:
+            ...         _ = file.write('id,score\\na,1\\nb,x\\n')
+            ...     multivalued_dict.from_file(path, key_col = 'id', value_col = 'score', header = True, value_type = 'q')  # doctest: +ELLIPSIS
+            Traceback (most recent call last):
+            ValueError: ... line 3: invalid literal for int() with base 10: 'x'
+            
+            >>> with tempfile.TemporaryDirectory() as tmp_dir:
+            ...     path = os.path.join(tmp_dir, 'kv.csv')
+            ...     with open(path, 'w') as file:
+            ...         _ = file.write('id,score\\na,1\\n')
+            ...     multivalued_dict.from_file(path, key_col = 'key', value_col = 'score', header = True)  # doctest: +ELLIPSIS
+            Traceback (most recent call last):
+            ValueError: ... line 1: header has no column 'key' or 'score': ['id', 'score']
+            
+            >>> with tempfile.TemporaryDirectory() as tmp_dir:
+            ...     path = os.path.join(tmp_dir, 'kv.jsonl')
+            ...     with open(path, 'w') as file:
+            ...         _ = file.write('["a", 1]\\n\\n["b", 2.5]\\n')
+            ...     multivalued_dict.from_file(path, format = 'jsonl', value_type = 'q')  # doctest: +ELLIPSIS
+            Traceback (most recent call last):
+            ValueError: ... line 3: 'float' object cannot be interpreted as an integer
+            
+            >>> with tempfile.TemporaryDirectory() as tmp_dir:
+            ...     path = os.path.join(tmp_dir, 'kv.csv')
+            ...     with open(path, 'w') as file:
+            ...         _ = file.write('a,1\\nb,-1\\n')
+            ...     multivalued_dict.from_file(path, value_type = 'B')  # doctest: +ELLIPSIS
+            Traceback (most recent call last):
+            ValueError: ... line 2: unsigned byte integer is less than minimum
+            
+            >>> multivalued_dict.from_file('kv.csv', value_type = 5)
+            Traceback (most recent call last):
+            ValueError: value_type must be one of 'bBhHiIlLqQfd' or None, not 5
+            
+            >>> import threading
+            >>> active_threads = threading.active_count()
+            >>> with tempfile.TemporaryDirectory() as tmp_dir:
+            ...     path = os.path.join(tmp_dir, 'kv.jsonl')
+            ...     with open(path, 'w') as file:
+            ...         _ = file.write('[["a"], 1]\\n' * 10)
+            ...     multivalued_dict.from_file(path, format = 'jsonl', chunk_size = 1, read_ahead = True)
+            Traceback (most recent call last):
+            TypeError: unhashable type: 'list'
+            >>> threading.active_count() == active_threads
+            True
+            
+            >>> with tempfile.TemporaryDirectory() as tmp_dir:
+            ...     path = os.path.join(tmp_dir, 'kv.csv')
+            ...     with open(path, 'w') as file:
+            ...         _ = file.write('a,1\\nb,2\\na,3\\n')
+            ...     multivalued_dict.from_file(path, value_type = 'q')
+            multivalued_dict({'a': array('q', [1, 3]), 'b': array('q', [2])})
+        '''
+        
+        assert format in ('csv', 'tsv', 'jsonl'), '"format" can only be "csv", "tsv" or "jsonl"'
+        assert chunk_size > 0, '"chunk_size" must be positive'
+        
+        new_mv_d = cls()
+        new_mv_d.set_value_type(value_type)
+        value_converter = None
+        if value_type is not None and format != 'jsonl':
+            value_converter = float if value_type in 'fd' else int
+        batches = _iter_file_batches(path, format, key_col, value_col, chunk_size, encoding, header, value_converter, value_type)
+        if read_ahead:
+            batches = _read_ahead(batches)
+        try:
+            for batch in batches:
+                new_mv_d.__extend_pairs(batch)
+        finally:
+            batches.close()
+        return new_mv_d
+    
     def __init__(self, *args, **kwargs):
         '''
             Initialize self.  See help(type(self)) for accurate signature.
@@ -131,6 +513,10 @@ class multivalued_dict(UserDict, metaclass = _eliminate_metaclass_conflicts):  #
             >>> mv_d
             multivalued_dict({'a': ['test-1', 'test-6', 'test-7'], 'b': ['test-2'], 'c': ['test-3'], 'd': ['test-4'], 'e': ['test-5']})
             
+            >>> from array import array
+            >>> multivalued_dict({'a': array('q', [1, 2])})
+            multivalued_dict({'a': [array('q', [1, 2])]})
+            
             >>> multivalued_dict.__init__('x')
             Traceback (most recent call last):
             TypeError: descriptor '__init__' requires a 'multivalued_dict' object but received a 'str'
@@ -141,15 +527,18 @@ class multivalued_dict(UserDict, metaclass = _eliminate_metaclass_conflicts):  #
             raise TypeError(f'multivalued_dict expected at most 1 arguments, got {len_of_args}')
         else:
             if not hasattr(self, 'data'):
-                self.data = self.defaultdict(list)
+                self.data = defaultdict(list)
             if len_of_args == 1:
                 initial_items = args[0]
                 if isinstance(initial_items, dict):
+                    data = self.data
+                    default_factory = data.default_factory
                     for _key, _value in initial_items.items():
-                        if isinstance(_value, (tuple, list)):
-                            self.data[_key].extend(_value)
+                        values = default_factory(_value) if isinstance(_value, (tuple, list)) else default_factory((_value,))
+                        if _key in data:
+                            data[_key].extend(values)
                         else:
-                            self.data[_key].append(_value)
+                            data[_key] = values
                 else:
                     self.update(initial_items)
         if kwargs != dict():
@@ -264,7 +653,7 @@ class multivalued_dict(UserDict, metaclass = _eliminate_metaclass_conflicts):  #
             multivalued_dict({'a': ['test-0'], 'b': ['test-4'], 'c': ['test-5']})
         '''
         
-        self.data.__setitem__(key, [item])
+        self.data.__setitem__(key, self.data.default_factory((item,)))
     
     def __lenvalue__(self, key = __marker):
         '''
@@ -316,8 +705,9 @@ class multivalued_dict(UserDict, metaclass = _eliminate_metaclass_conflicts):  #
         assert direction in (START_POS, END_POS), '"direction" can only be START_POS or END_POS'
         
         if allkv:
-            while value in self.data[key]:
-                self.data[key].remove(value)
+            values = self.data[key]
+            if value in values:
+                values[:] = self.data.default_factory(_value for _value in values if not (_value is value or _value == value))
         else:
             if direction == START_POS:
                 self.data[key].remove(value)
@@ -328,6 +718,25 @@ class multivalued_dict(UserDict, metaclass = _eliminate_metaclass_conflicts):  #
                         self.data[key].__delitem__(-1 - i)
                         break
     
+    def __extend_pairs(self, pairs):
+        '''
+            Append each (key, value) of pairs, skipping the per-element checks of update.
+            
+            >>> mv_d = multivalued_dict({'a': 'test-1'})
+            >>> mv_d._multivalued_dict__extend_pairs([('a', 'test-2'), ('b', 'test-3')])
+            >>> mv_d
+            multivalued_dict({'a': ['test-1', 'test-2'], 'b': ['test-3']})
+        '''
+        
+        data = self.data
+        default_factory = data.default_factory
+        for _key, _value in pairs:
+            values = data.get(_key)
+            if values is None:
+                data[_key] = default_factory((_value,))
+            else:
+                values.append(_value)
+    
     def __reverse__(self):
         '''
             >>> mv_d = multivalued_dict([['a', 1], ['b', 2], ['c', 3]])
@@ -352,7 +761,8 @@ class multivalued_dict(UserDict, metaclass = _eliminate_metaclass_conflicts):  #
             [None]
         '''
         
-        return self.data.get(key, [default])
+        default_factory = self.data.default_factory
+        return self.data.get(key, default_factory(() if default is None and default_factory is not list else (default,)))
     
     def count(self, key, value):
         '''
@@ -417,12 +827,22 @@ class multivalued_dict(UserDict, metaclass = _eliminate_metaclass_conflicts):  #
             update_items = args[0]
             if not isinstance(update_items, self.Iterable):
                 raise TypeError(f"'{update_items.__class__.__name__}' object is not iterable")
+            data = self.data
+            default_factory = data.default_factory
             if multivalued_dict.__is_multivalued_dict__(update_items):
                 for _key, _value in update_items.items():
-                    self.data[_key].extend(_value)
+                    values = data.get(_key)
+                    if values is None:
+                        data[_key] = default_factory(_value)
+                    else:
+                        values.extend(default_factory(_value))
             elif isinstance(update_items, dict):
                 for _key, _value in update_items.items():
-                    self.data[_key].append(_value)
+                    values = data.get(_key)
+                    if values is None:
+                        data[_key] = default_factory((_value,))
+                    else:
+                        values.append(_value)
             else:
                 i = 0
                 for item in update_items:
@@ -431,7 +851,11 @@ class multivalued_dict(UserDict, metaclass = _eliminate_metaclass_conflicts):  #
                     if len(item) != 2:
                         raise ValueError(f'dictionary update sequence element #{i} has length {len(item)}; 2 is required')
                     _key, _value = item
-                    self.data[_key].append(_value)
+                    values = data.get(_key)
+                    if values is None:
+                        data[_key] = default_factory((_value,))
+                    else:
+                        values.append(_value)
                     i += 1
         if kwargs != dict():
             self.update(kwargs)
@@ -453,7 +877,7 @@ class multivalued_dict(UserDict, metaclass = _eliminate_metaclass_conflicts):  #
             multivalued_dict({'a': ['test-1'], 'c': ['test-3'], 'b': [None], 'd': ['test=4']})
         '''
         
-        return self.data.setdefault(key, [default])
+        return self.data.setdefault(key, self.data.default_factory((default,)))
     
     def pop(self, key, default=__marker):
         '''
@@ -479,7 +903,8 @@ class multivalued_dict(UserDict, metaclass = _eliminate_metaclass_conflicts):  #
         if default is self.__marker:
             return self.data.pop(key)
         else:
-            return self.data.pop(key, [default])
+            default_factory = self.data.default_factory
+            return self.data.pop(key, default_factory(() if default is None and default_factory is not list else (default,)))
     
     def popitem(self):
         '''
@@ -509,9 +934,24 @@ class multivalued_dict(UserDict, metaclass = _eliminate_metaclass_conflicts):  #
             multivalued_dict({'a': [1, 99, 3]})
             >>> mv_d_b
             multivalued_dict({'a': [1, 2, 3]})
+            
+            >>> mv_d_a.set_value_type('q')
+            >>> mv_d_a.copy()
+            multivalued_dict({'a': array('q', [1, 99, 3])})
+            
+            >>> mv_d_a.enable_prefix_index()
+            >>> mv_d_c = mv_d_a.copy()
+            >>> mv_d_c['a/x'] = 4
+            >>> mv_d_c.keys_with_prefix('a/'), isinstance(mv_d_c.data, _prefix_indexed_defaultdict)
+            (['a/x'], True)
         '''
         
-        return multivalued_dict(self.data)
+        default_factory = self.data.default_factory
+        new_mv_d = multivalued_dict()
+        new_mv_d.data = defaultdict(default_factory, ((_key, default_factory(_value)) for _key, _value in self.data.items()))
+        if isinstance(self.data, _prefix_indexed_defaultdict):
+            new_mv_d.enable_prefix_index()
+        return new_mv_d
     
     def items(self):
         '''
@@ -571,3 +1011,201 @@ class multivalued_dict(UserDict, metaclass = _eliminate_metaclass_conflicts):  #
         '''
         
         self.data.clear()
+    
+    def enable_prefix_index(self):
+        '''
+            Index the str keys of D in sorted order, so that the *_with_prefix methods run
+            in time proportional to the size of the result rather than the number of keys.
+            The index is kept in sync by every method that adds or removes keys.
+            
+            >>> mv_d = multivalued_dict({'a/x': 'test-1', 'b/x': 'test-2'})
+            >>> mv_d.enable_prefix_index()
+            >>> mv_d['a/y'] = 'test-3'
+            >>> mv_d.update([['a/z', 'test-4'], ['a/x', 'test-5']])
+            >>> mv_d.keys_with_prefix('a/')
+            ['a/x', 'a/y', 'a/z']
+            >>> mv_d.pop('a/y')
+            ['test-3']
+            >>> del mv_d['a/z']
+            >>> mv_d.keys_with_prefix('a/')
+            ['a/x']
+            >>> mv_d
+            multivalued_dict({'a/x': ['test-1', 'test-5'], 'b/x': ['test-2']})
+            
+            >>> mv_d |= {'a/zz': ['test-6']}
+            >>> mv_d.__reverse__()
+            >>> mv_d.keys_with_prefix('a/')
+            ['a/x', 'a/zz']
+            
+            >>> mv_d = multivalued_dict()
+            >>> mv_d.enable_prefix_index()
+            >>> mv_d.update((f'user/{i}', i) for i in range(20000))
+            >>> mv_d.lenvalue_with_prefix('user/1999')
+            11
+            >>> for i in range(0, 20000, 2):
+            ...     del mv_d[f'user/{i}']
+            >>> mv_d.keys_with_prefix('user/1999')
+            ['user/1999', 'user/19991', 'user/19993', 'user/19995', 'user/19997', 'user/19999']
+            >>> mv_d['user/19990'] = 0
+            >>> mv_d.lenvalue_with_prefix('user/1999'), mv_d.lenvalue_with_prefix('')
+            (7, 10001)
+        '''
+        
+        if not isinstance(self.data, _prefix_indexed_defaultdict):
+            self.data = _prefix_indexed_defaultdict(self.data.default_factory, self.data)
+    
+    def disable_prefix_index(self):
+        '''
+            Drop the prefix index of D; the *_with_prefix methods fall back to a full key scan.
+            
+            >>> mv_d = multivalued_dict({'a/x': 'test-1', 'b/x': 'test-2'})
+            >>> mv_d.enable_prefix_index()
+            >>> mv_d.disable_prefix_index()
+            >>> mv_d.keys_with_prefix('b/')
+            ['b/x']
+        '''
+        
+        if isinstance(self.data, _prefix_indexed_defaultdict):
+            self.data = defaultdict(self.data.default_factory, self.data)
+    
+    def keys_with_prefix(self, prefix):
+        '''
+            D.keys_with_prefix(p) -> a sorted list of the str keys of D that start with p
+            
+            >>> mv_d = multivalued_dict([['user/2', 'x'], ['user/1', 'y'], ['tenant/1', 'z'], [1, 'w']])
+            >>> mv_d.keys_with_prefix('user/')
+            ['user/1', 'user/2']
+            >>> mv_d.enable_prefix_index()
+            >>> mv_d.keys_with_prefix('user/')
+            ['user/1', 'user/2']
+            >>> mv_d.keys_with_prefix('')
+            ['tenant/1', 'user/1', 'user/2']
+            
+            >>> mv_d.keys_with_prefix(1)
+            Traceback (most recent call last):
+            TypeError: prefix must be str, not int
+        '''
+        
+        if not isinstance(prefix, str):
+            raise TypeError(f'prefix must be str, not {prefix.__class__.__name__}')
+        if isinstance(self.data, _prefix_indexed_defaultdict):
+            return list(self.data.keys_with_prefix(prefix))
+        else:
+            return sorted(_key for _key in self.data if isinstance(_key, str) and _key.startswith(prefix))
+    
+    def items_with_prefix(self, prefix):
+        '''
+            D.items_with_prefix(p) -> a list of the (k, v) pairs of D whose str key k starts with p, sorted by k
+            
+            >>> mv_d = multivalued_dict([['user/2', 'x'], ['user/1', 'y'], ['tenant/1', 'z'], ['user/1', 'w']])
+            >>> mv_d.enable_prefix_index()
+            >>> mv_d.items_with_prefix('user/')
+            [('user/1', ['y', 'w']), ('user/2', ['x'])]
+        '''
+        
+        data = self.data
+        return [(_key, data[_key]) for _key in self.keys_with_prefix(prefix)]
+    
+    def lenvalue_with_prefix(self, prefix):
+        '''
+            D.lenvalue_with_prefix(p) -> the total number of values under the str keys of D that start with p
+            
+            >>> mv_d = multivalued_dict([['user/2', 'x'], ['user/1', 'y'], ['tenant/1', 'z'], ['user/1', 'w']])
+            >>> mv_d.enable_prefix_index()
+            >>> mv_d.lenvalue_with_prefix('user/')
+            3
+            >>> mv_d.popitem()
+            ('tenant/1', ['z'])
+            >>> mv_d.lenvalue_with_prefix('tenant/')
+            0
+            >>> mv_d.clear()
+            >>> mv_d.lenvalue_with_prefix('')
+            0
+        '''
+        
+        data = self.data
+        return sum(len(data[_key]) for _key in self.keys_with_prefix(prefix))
+    
+    @property
+    def value_type(self):
+        '''
+            The array typecode the values of D are stored with, or None if they are stored in lists.
+            
+            >>> mv_d = multivalued_dict({'a': 1})
+            >>> mv_d.value_type is None
+            True
+            >>> mv_d.set_value_type('d')
+            >>> mv_d.value_type
+            'd'
+        '''
+        
+        default_factory = self.data.default_factory
+        return default_factory.args[0] if isinstance(default_factory, partial) else None
+    
+    def set_value_type(self, typecode):
+        '''
+            Store the values of D in array.array buffers of the numeric typecode
+            (one of 'bBhHiIlLqQfd'), or back in lists if typecode is None.
+            
+            Each value then takes the itemsize of the typecode instead of a pointer plus a boxed
+            object, and count, __matchkv__, __delkv__ and __lenvalue__ scan the contiguous buffer.
+            The values of D are then arrays, so D only compares equal to mappings of arrays,
+            and get and pop return their default wrapped in an array (an empty one for None).
+            If any value cannot be stored with typecode, D is left unchanged.
+            
+            >>> mv_d = multivalued_dict([['a', 1], ['a', 2], ['a', 2], ['b', 3]])
+            >>> mv_d.set_value_type('q')
+            >>> mv_d
+            multivalued_dict({'a': array('q', [1, 2, 2]), 'b': array('q', [3])})
+            >>> mv_d['c'] = 4
+            >>> mv_d.update([['a', 5], ['c', 6]])
+            >>> mv_d.count('a', 2), mv_d.__matchkv__('c', 6), mv_d.__lenvalue__()
+            (2, True, 7)
+            >>> mv_d.__delkv__('a', 2)
+            >>> mv_d
+            multivalued_dict({'a': array('q', [1, 5]), 'b': array('q', [3]), 'c': array('q', [4, 6])})
+            
+            >>> mv_d.update([['a', 1.5]])
+            Traceback (most recent call last):
+            TypeError: 'float' object cannot be interpreted as an integer
+            >>> mv_d.update([['new', 1.5]])
+            Traceback (most recent call last):
+            TypeError: 'float' object cannot be interpreted as an integer
+            >>> mv_d.setdefault('z')
+            Traceback (most recent call last):
+            TypeError: 'NoneType' object cannot be interpreted as an integer
+            >>> 'new' in mv_d, 'z' in mv_d
+            (False, False)
+            >>> mv_d.get('x', 7), mv_d.get('x'), mv_d.pop('x', 7)
+            (array('q', [7]), array('q'), array('q', [7]))
+            
+            >>> mv_d.set_value_type(None)
+            >>> mv_d
+            multivalued_dict({'a': [1, 5], 'b': [3], 'c': [4, 6]})
+            
+            >>> mv_d.set_value_type('x')
+            Traceback (most recent call last):
+            ValueError: value_type must be one of 'bBhHiIlLqQfd' or None, not 'x'
+            
+            >>> mv_d = multivalued_dict([['a', 1], ['b', 'x']])
+            >>> mv_d.set_value_type('q')
+            Traceback (most recent call last):
+            TypeError: 'str' object cannot be interpreted as an integer
+            >>> mv_d = multivalued_dict([['a', 1], ['b', 300]])
+            >>> mv_d.set_value_type('b')
+            Traceback (most recent call last):
+            OverflowError: signed char is greater than maximum
+            >>> mv_d, mv_d.value_type
+            (multivalued_dict({'a': [1], 'b': [300]}), None)
+        '''
+        
+        if typecode is None:
+            default_factory = list
+        elif isinstance(typecode, str) and len(typecode) == 1 and typecode in _NUMERIC_TYPECODES:
+            default_factory = partial(array, typecode)
+        else:
+            raise ValueError(f'value_type must be one of {_NUMERIC_TYPECODES!r} or None, not {typecode!r}')
+        data = self.data
+        converted_items = {_key: default_factory(_value) for _key, _value in data.items()}
+        data.update(converted_items)
+        data.default_factory = default_factory